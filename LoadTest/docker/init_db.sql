@@ -26,18 +26,20 @@ CREATE TABLE IF NOT EXISTS test_runs (
 
 -- Table 3: Raw_Metrics
 -- Stores raw metric data collected during test runs
-CREATE TABLE IF NOT EXISTS raw_metrics (
-    id UUID PRIMARY KEY,
+-- UNLOGGED skips WAL writes for this high-volume table; its contents are
+-- truncated if PostgreSQL crashes (a clean shutdown keeps them)
+CREATE UNLOGGED TABLE IF NOT EXISTS raw_metrics (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     run_id UUID NOT NULL REFERENCES test_runs(run_id) ON DELETE CASCADE,
     metric_name VARCHAR(255) NOT NULL,
-    metric_value VARCHAR(255) NOT NULL,
+    metric_value DOUBLE PRECISION NOT NULL,
     timestamp TIMESTAMP NOT NULL
 );
 
 -- Table 4: Results_Log
 -- Stores evaluation results comparing expected vs measured values
 CREATE TABLE IF NOT EXISTS results_log (
-    id UUID PRIMARY KEY,
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     run_id UUID NOT NULL REFERENCES test_runs(run_id) ON DELETE CASCADE,
     metric_name VARCHAR(255) NOT NULL,
     expected_value VARCHAR(255),
@@ -49,7 +51,7 @@ CREATE TABLE IF NOT EXISTS results_log (
 -- Table 5: Scenario_Summary
 -- Stores aggregated metrics after a scenario completes all runs
 CREATE TABLE IF NOT EXISTS scenario_summary (
-    id UUID PRIMARY KEY,
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     scenario_id UUID NOT NULL REFERENCES scenarios(scenario_id) ON DELETE CASCADE,
     metric_name VARCHAR(255) NOT NULL,
     sample_count INTEGER NOT NULL,
@@ -63,6 +65,16 @@ CREATE TABLE IF NOT EXISTS scenario_summary (
     UNIQUE(scenario_id, metric_name)
 );
 
+-- Table 6: Pending_Jobs
+-- Scenario assignments waiting to be claimed by the worker pool
+CREATE TABLE IF NOT EXISTS pending_jobs (
+    job_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    scenario_id UUID NOT NULL REFERENCES scenarios(scenario_id) ON DELETE CASCADE,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    claimed_by VARCHAR(255),
+    claimed_at TIMESTAMP
+);
+
 -- Create indexes for better query performance
 CREATE INDEX IF NOT EXISTS idx_test_runs_scenario ON test_runs(scenario_id);
 CREATE INDEX IF NOT EXISTS idx_test_runs_start_time ON test_runs(start_time);
@@ -73,6 +85,7 @@ CREATE INDEX IF NOT EXISTS idx_results_log_run ON results_log(run_id);
 CREATE INDEX IF NOT EXISTS idx_results_log_status ON results_log(status);
 CREATE INDEX IF NOT EXISTS idx_results_log_scope ON results_log(scope);
 CREATE INDEX IF NOT EXISTS idx_scenario_summary_scenario ON scenario_summary(scenario_id);
+CREATE INDEX IF NOT EXISTS idx_pending_jobs_unclaimed ON pending_jobs(created_at) WHERE claimed_by IS NULL;
 
 -- Grant permissions (adjust as needed)
 GRANT ALL PRIVILEGES ON SCHEMA load_test TO postgres;
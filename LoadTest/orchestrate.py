@@ -7,16 +7,21 @@ It reads configuration from main.json, manages PostgreSQL database,
 schedules tests, and exports results.
 """
 
+import functools
 import json
 import os
-import subprocess
 import time
 import uuid
 from datetime import datetime, timedelta
 from pathlib import Path
 
-from src.utils.db import insert_scenario, export_tables_to_csv
+import docker
+from docker.errors import APIError, NotFound
+from docker.types import RestartPolicy, ServiceMode
+
+from src.utils.db import insert_scenario, clear_pending_jobs, insert_pending_job, export_tables_to_csv
 from src.utils.uuid_generator import generate_uuid4
+from src.utils.scenario_spec import ScenarioSpec
 from src.scheduler import ScenarioScheduler
 
 
@@ -24,10 +29,21 @@ CONFIG_PATH = "configurations/main.json"
 DOCKER_IMAGE = "loadtest:latest"
 DB_CONTAINER_NAME = "db-container"
 DB_VOLUME_NAME = "load-test"
+NETWORK_NAME = "loadtest-network"
+WORKER_SERVICE_NAME = "loadtest-workers"
 
 
 def load_config(config_path: str = CONFIG_PATH) -> dict:
-    """Load configuration from main.json."""
+    """
+    Load configuration from main.json.
+    The parsed result is cached until the file changes; callers must not mutate it.
+    """
+    return _load_config_cached(config_path, os.stat(config_path).st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=4)
+def _load_config_cached(config_path: str, mtime_ns: int) -> dict:
+    """Parse a config file; mtime_ns is part of the cache key only."""
     with open(config_path, "r") as f:
         return json.load(f)
 
@@ -39,157 +55,173 @@ def setup_report_path(config: dict) -> str:
     return report_path
 
 
-def start_postgres_container() -> None:
+def start_postgres_container(client: docker.DockerClient) -> None:
     """Start PostgreSQL container with Docker volume."""
-    # Create volume if not exists
-    subprocess.run(
-        ["docker", "volume", "create", DB_VOLUME_NAME],
-        capture_output=True
-    )
+    # Create volume if not exists (no-op for an existing local volume)
+    client.volumes.create(name=DB_VOLUME_NAME)
 
     # Check if container already running
-    result = subprocess.run(
-        ["docker", "ps", "-q", "-f", f"name={DB_CONTAINER_NAME}"],
-        capture_output=True,
-        text=True
-    )
-
-    if result.stdout.strip():
+    if client.containers.list(filters={"name": DB_CONTAINER_NAME}):
         print(f"Container {DB_CONTAINER_NAME} already running")
         return
 
     # Remove stopped container if exists
-    subprocess.run(
-        ["docker", "rm", "-f", DB_CONTAINER_NAME],
-        capture_output=True
-    )
+    try:
+        client.containers.get(DB_CONTAINER_NAME).remove(force=True)
+    except NotFound:
+        pass
 
     # Start PostgreSQL container
-    subprocess.run([
-        "docker", "run", "-d",
-        "--name", DB_CONTAINER_NAME,
-        "-e", "POSTGRES_PASSWORD=postgres",
-        "-e", "POSTGRES_DB=postgres",
-        "-v", f"{DB_VOLUME_NAME}:/var/lib/postgresql/data",
-        "-p", "5432:5432",
-        "--network", "loadtest-network",
-        "-v", f"{os.path.abspath('docker/init_db.sql')}:/docker-entrypoint-initdb.d/init_db.sql",
-        "postgres:16-alpine"
-    ], check=True)
+    client.containers.run(
+        "postgres:16-alpine",
+        name=DB_CONTAINER_NAME,
+        detach=True,
+        environment={
+            "POSTGRES_PASSWORD": "postgres",
+            "POSTGRES_DB": "postgres",
+        },
+        volumes={
+            DB_VOLUME_NAME: {"bind": "/var/lib/postgresql/data", "mode": "rw"},
+            os.path.abspath("docker/init_db.sql"): {
+                "bind": "/docker-entrypoint-initdb.d/init_db.sql", "mode": "ro",
+            },
+        },
+        ports={"5432/tcp": 5432},
+        network=NETWORK_NAME,
+    )
 
     # Wait for PostgreSQL to be ready
     print("Waiting for PostgreSQL to start...")
     time.sleep(10)
 
 
-def ensure_docker_network() -> None:
+def ensure_docker_network(client: docker.DockerClient) -> None:
     """Ensure Docker overlay network exists for Swarm service communication."""
-    # Check if network already exists
-    result = subprocess.run(
-        ["docker", "network", "ls", "--filter", "name=loadtest-network", "--format", "{{.Name}}"],
-        capture_output=True,
-        text=True
-    )
-
-    if "loadtest-network" in result.stdout:
-        print("  Network loadtest-network already exists")
+    # Check if network already exists (the name filter also matches substrings)
+    if any(network.name == NETWORK_NAME for network in client.networks.list(names=[NETWORK_NAME])):
+        print(f"  Network {NETWORK_NAME} already exists")
         return
 
     # Create overlay network for Swarm services (attachable so regular containers can join)
-    result = subprocess.run(
-        ["docker", "network", "create", "--driver", "overlay", "--attachable", "loadtest-network"],
-        capture_output=True,
-        text=True
-    )
-
-    if result.returncode != 0:
-        print(f"  Warning: Failed to create overlay network: {result.stderr}")
+    try:
+        client.networks.create(NETWORK_NAME, driver="overlay", attachable=True)
+    except APIError as exc:
+        print(f"  Warning: Failed to create overlay network: {exc}")
         # Fallback to bridge network for non-swarm mode
         print("  Attempting to create bridge network instead...")
-        subprocess.run(
-            ["docker", "network", "create", "loadtest-network"],
-            capture_output=True
-        )
+        try:
+            client.networks.create(NETWORK_NAME)
+        except APIError:
+            pass
     else:
-        print("  Created overlay network: loadtest-network")
+        print(f"  Created overlay network: {NETWORK_NAME}")
 
 
-def init_docker_swarm() -> None:
+def init_docker_swarm(client: docker.DockerClient) -> None:
     """Initialize Docker Swarm if not already active."""
-    result = subprocess.run(
-        ["docker", "info", "--format", "{{.Swarm.LocalNodeState}}"],
-        capture_output=True,
-        text=True
-    )
-    swarm_state = result.stdout.strip()
+    swarm_state = client.info().get("Swarm", {}).get("LocalNodeState", "")
     print(f"  Swarm state: {swarm_state}")
 
     if swarm_state != "active":
         print("  Initializing Docker Swarm...")
-        init_result = subprocess.run(
-            ["docker", "swarm", "init"],
-            capture_output=True,
-            text=True
-        )
-        if init_result.returncode != 0:
-            print(f"  Warning: Swarm init failed: {init_result.stderr}")
+        try:
+            client.swarm.init()
+        except APIError as exc:
+            print(f"  Warning: Swarm init failed: {exc}")
         else:
             print("  Swarm initialized successfully")
     else:
         print("  Swarm already active")
 
 
-def deploy_test_service(scenario_id: str, scenario_config: dict, replicas: int = 1) -> str:
+def deploy_worker_pool(client: docker.DockerClient, replicas: int):
     """
-    Deploy a Docker Swarm service for running tests in parallel.
-    Returns the service name.
+    Deploy the Docker Swarm service whose replicas run scenarios.
+
+    Workers start ahead of time and block until a job is posted to the
+    pending_jobs table, so dispatching a scenario is a single insert rather
+    than a service create. Each replica runs one scenario and exits.
+    Returns the created Service.
     """
-    service_name = f"loadtest-{scenario_id[:8]}"
-    protocol = scenario_config.get("protocol", "unknown")
+    # Remove a pool left behind by an interrupted run
+    try:
+        client.services.get(WORKER_SERVICE_NAME).remove()
+    except NotFound:
+        pass
 
     # Environment variables for the container
     env_vars = [
-        "-e", f"SCENARIO_ID={scenario_id}",
-        "-e", f"SCENARIO_CONFIG={json.dumps(scenario_config)}",
-        "-e", "DB_HOST=db-container",
-        "-e", "DB_PORT=5432",
-        "-e", "DB_NAME=postgres",
-        "-e", "DB_USER=postgres",
-        "-e", "DB_PASSWORD=postgres",
+        "DB_HOST=db-container",
+        "DB_PORT=5432",
+        "DB_NAME=postgres",
+        "DB_USER=postgres",
+        "DB_PASSWORD=postgres",
     ]
 
-    cmd = [
-        "docker", "service", "create",
-        "--name", service_name,
-        "--replicas", str(replicas),
-        "--network", "loadtest-network",
-        "--restart-condition", "none",
-    ] + env_vars + [
+    return client.services.create(
         DOCKER_IMAGE,
-        "python3", "-m", "src.worker", scenario_id
-    ]
-
-    subprocess.run(cmd, check=True)
-    return service_name
+        args=["python3", "-m", "src.worker"],
+        name=WORKER_SERVICE_NAME,
+        env=env_vars,
+        networks=[NETWORK_NAME],
+        restart_policy=RestartPolicy(condition="none"),
+        mode=ServiceMode("replicated", replicas=replicas),
+    )
 
 
-def remove_service(service_name: str) -> None:
+def remove_service(service) -> None:
     """Remove a Docker Swarm service."""
-    subprocess.run(
-        ["docker", "service", "rm", service_name],
-        capture_output=True
+    try:
+        service.remove()
+    except APIError:
+        pass
+
+
+def wait_for_workers(client: docker.DockerClient, service, expected: int,
+                     since: float, until: datetime) -> int:
+    """
+    Block until `expected` task containers of the service have exited or `until` passes.
+
+    Consumes the Docker event stream instead of polling, so the orchestrator
+    wakes up as soon as the last worker finishes. Events are replayed from
+    `since` so workers that exit before the stream is opened are not missed.
+    Events are matched on the service ID, so containers of a stale pool with
+    the same service name are not counted.
+    Returns the number of workers that had not finished.
+    """
+    remaining = expected
+    if remaining <= 0:
+        return 0
+
+    events = client.events(
+        since=int(since),
+        until=int(until.timestamp()),
+        filters={
+            "type": "container",
+            "event": "die",
+            "label": f"com.docker.swarm.service.id={service.id}",
+        },
+        decode=True,
     )
+    try:
+        for _ in events:
+            remaining -= 1
+            print(f"  Worker finished ({remaining} remaining)")
+            if remaining <= 0:
+                break
+    finally:
+        events.close()
 
+    return remaining
 
-def calculate_total_duration(scenarios: list[dict]) -> timedelta:
+
+def calculate_total_duration(specs: list[ScenarioSpec]) -> timedelta:
     """Calculate the maximum duration across all scenarios."""
     max_duration = timedelta(0)
-    for scenario in scenarios:
-        if not scenario.get("enabled", False):
+    for spec in specs:
+        if not spec.enabled:
             continue
-        schedule = scenario.get("schedule", {})
-        duration_hours = schedule.get("duration_hours", 1)
-        max_duration = max(max_duration, timedelta(hours=duration_hours))
+        max_duration = max(max_duration, timedelta(hours=spec.duration_hours))
     return max_duration
 
 
@@ -202,6 +234,8 @@ def orchestrate():
     # Step 1: Load configuration
     print("\n[1/7] Loading configuration...")
     config = load_config()
+    specs = [ScenarioSpec.from_config(scenario) for scenario in config.get("scenarios", [])]
+    enabled_count = sum(1 for spec in specs if spec.enabled)
 
     # Step 2: Setup report path
     print("[2/7] Setting up report path...")
@@ -210,49 +244,51 @@ def orchestrate():
 
     # Step 3: Setup Docker infrastructure
     print("[3/7] Setting up Docker infrastructure...")
-    init_docker_swarm()  # Must init swarm before creating overlay network
-    ensure_docker_network()
-    start_postgres_container()
+    client = docker.from_env()
+    init_docker_swarm(client)  # Must init swarm before creating overlay network
+    ensure_docker_network(client)
+    start_postgres_container(client)
+
+    # Start the worker pool early so containers boot while scenarios are prepared
+    clear_pending_jobs()
+    pool_started = time.time()
+    worker_pool = deploy_worker_pool(client, enabled_count) if enabled_count else None
 
     # Step 4: Process enabled scenarios
     print("[4/7] Processing scenarios...")
-    scenarios = config.get("scenarios", [])
     scheduler = ScenarioScheduler()
-    active_services = []
     scenario_ids = {}
 
-    for scenario in scenarios:
-        if not scenario.get("enabled", False):
-            print(f"  Skipping disabled scenario: {scenario.get('id', 'unknown')}")
+    for spec in specs:
+        if not spec.enabled:
+            print(f"  Skipping disabled scenario: {spec.name or 'unknown'}")
             continue
 
         # Generate UUID for scenario
         scenario_id = generate_uuid4()
-        scenario_ids[scenario.get("id")] = scenario_id
-        protocol = scenario.get("protocol", "unknown")
+        scenario_ids[spec.name] = scenario_id
 
-        print(f"  Processing scenario: {scenario.get('id')} ({protocol})")
+        print(f"  Processing scenario: {spec.name} ({spec.protocol})")
         print(f"    UUID: {scenario_id}")
 
         # Step 5: Insert scenario into database
         insert_scenario(
             scenario_id=scenario_id,
-            protocol=protocol,
-            config_snapshot=scenario
+            protocol=spec.protocol,
+            config_snapshot=spec.config
         )
 
         # Step 6: Schedule the scenario
-        scheduler.schedule_scenario(scenario_id, scenario)
+        scheduler.schedule_scenario(scenario_id, spec)
 
-        # Deploy Docker Swarm service for parallel execution
-        service_name = deploy_test_service(scenario_id, scenario, replicas=1)
-        active_services.append((service_name, scenario_id))
+        # Hand the scenario to a pooled worker
+        insert_pending_job(scenario_id)
 
     # Step 7: Start scheduler and wait for completion
     print("[5/7] Starting scheduler...")
     scheduler.start()
 
-    total_duration = calculate_total_duration(scenarios)
+    total_duration = calculate_total_duration(specs)
     print(f"  Total test duration: {total_duration}")
 
     # Monitor and wait for completion
@@ -261,20 +297,16 @@ def orchestrate():
     end_time = start_time + total_duration + timedelta(minutes=5)  # Add buffer
 
     try:
-        while datetime.now() < end_time:
-            # Check if all scenarios are complete
-            all_complete = all(
-                scheduler.is_scenario_complete(sid)
-                for sid in scenario_ids.values()
-            )
-
-            if all_complete:
-                print("  All scenarios completed")
-                break
-
-            pending_jobs = scheduler.get_pending_jobs()
-            print(f"  {len(pending_jobs)} jobs pending...", end="\r")
-            time.sleep(30)
+        unfinished = wait_for_workers(
+            client, worker_pool, enabled_count, since=pool_started, until=end_time
+        )
+        remaining_seconds = max(0.0, (end_time - datetime.now()).total_seconds())
+        if unfinished:
+            print(f"  Timed out waiting for {unfinished} workers")
+        elif not scheduler.wait_all_complete(timeout=remaining_seconds):
+            print("  Timed out waiting for scheduled runs")
+        else:
+            print("  All scenarios completed")
 
     except KeyboardInterrupt:
         print("\n  Interrupted by user")
@@ -287,8 +319,8 @@ def orchestrate():
     scheduler.shutdown()
 
     # Cleanup services
-    for service_name, _ in active_services:
-        remove_service(service_name)
+    if worker_pool is not None:
+        remove_service(worker_pool)
 
     # Step 8: Export results to CSV
     print("[7/7] Exporting results to CSV...")
@@ -1,15 +1,35 @@
+import dataclasses
+import functools
+import operator
 import os
+import threading
+import time
 import uuid
 import socket
+import typing
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Callable
+from apscheduler.events import (
+    EVENT_JOB_ERROR,
+    EVENT_JOB_EXECUTED,
+    EVENT_JOB_MAX_INSTANCES,
+    EVENT_JOB_MISSED,
+    EVENT_JOB_SUBMITTED,
+)
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.triggers.date import DateTrigger
 
-from src.utils.db import insert_test_run, insert_raw_metrics_batch, insert_result_log
-from src.utils.aggregator import aggregate_metrics_for_run, get_aggregated_value, save_scenario_summary
-from src.utils.unit_converter import normalize_for_comparison
+from src.utils.db import insert_test_run, insert_raw_metrics_batch, insert_result_logs_batch, flush_metrics
+from src.utils.aggregator import (
+    aggregate_metrics_for_run,
+    aggregate_metrics_for_scenario,
+    select_aggregated_value,
+    save_scenario_summary,
+)
+from src.utils.unit_converter import convert_to_standard
+from src.utils.scenario_spec import ScenarioSpec
 from src.test_modules.speed_test import run_speed_test
 from src.test_modules.web_browsing import run_web_browsing_test
 
@@ -19,13 +39,88 @@ PROTOCOL_HANDLERS = {
     "web_browsing": run_web_browsing_test,
 }
 
+COMPARISON_OPERATORS = {
+    "lte": operator.le,
+    "lt": operator.lt,
+    "gte": operator.ge,
+    "gt": operator.gt,
+    "eq": operator.eq,
+}
+
+
+# Result dataclass type -> names of its int/float fields
+_NUMERIC_FIELDS: dict[type, tuple[str, ...]] = {}
+
+
+def _numeric_fields(result_type: type) -> tuple[str, ...]:
+    """Return the numeric field names of a result dataclass, resolved once per type."""
+    fields = _NUMERIC_FIELDS.get(result_type)
+    if fields is None:
+        hints = typing.get_type_hints(result_type)
+        fields = tuple(
+            field.name for field in dataclasses.fields(result_type)
+            if hints.get(field.name) in (int, float)
+        )
+        _NUMERIC_FIELDS[result_type] = fields
+    return fields
+
+
+def _always_fail(measured: float, expected: float) -> bool:
+    """Comparison used for unknown operators."""
+    return False
+
+
+@dataclass(frozen=True)
+class CompiledExpectation:
+    """An expectation resolved once at scheduling time."""
+    metric_name: str
+    compare: Callable[[float, float], bool]
+    expected_normalized: float  # Expected value in the metric's standard unit
+    expected_label: str         # Expected value as written to results_log
+    aggregation: str
+
+
+def compile_expectations(expectations: list, scope: str) -> list[CompiledExpectation]:
+    """Resolve operators and unit conversions for the expectations of one scope."""
+    compiled = []
+    for expectation in expectations:
+        if expectation.get("evaluation_scope") != scope:
+            continue
+
+        metric_name = expectation.get("metric")
+        expected_value = expectation.get("value")
+        expected_unit = expectation.get("unit", "")
+
+        compiled.append(CompiledExpectation(
+            metric_name=metric_name,
+            compare=COMPARISON_OPERATORS.get(expectation.get("operator"), _always_fail),
+            # Measured values are already in standard units; only expected needs converting
+            expected_normalized=convert_to_standard(expected_value, expected_unit, metric_name),
+            expected_label=f"{expected_value} {expected_unit}",
+            aggregation=expectation.get("aggregation", "avg"),
+        ))
+    return compiled
+
 
 class ScenarioScheduler:
     def __init__(self):
         self.scheduler = BackgroundScheduler()
         self.scenario_jobs = {}  # scenario_id -> job_id mapping
         self.scenario_end_times = {}  # scenario_id -> end_time
-        self.scenario_configs = {}  # scenario_id -> full config
+        self.scenario_specs = {}  # scenario_id -> ScenarioSpec
+        self.per_iteration_expectations = {}  # scenario_id -> [CompiledExpectation]
+        self.scenario_expectations = {}  # scenario_id -> [CompiledExpectation]
+        self.job_scenarios = {}  # job_id -> scenario_id
+        self.completion_events = {}  # scenario_id -> threading.Event set after the last run
+        self.scenario_triggers = {}  # scenario_id -> trigger of the scenario's job
+        self.runs_in_flight = {}  # scenario_id -> submitted run times not yet executed or missed
+        self.final_fire_reached = set()  # scenario_ids whose trigger has no fire times left
+        self._completion_lock = threading.Lock()
+        self.scheduler.add_listener(
+            self._on_job_event,
+            EVENT_JOB_SUBMITTED | EVENT_JOB_MAX_INSTANCES
+            | EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED
+        )
 
     def start(self):
         """Start the scheduler."""
@@ -35,84 +130,62 @@ class ScenarioScheduler:
         """Shutdown the scheduler."""
         self.scheduler.shutdown(wait=wait)
 
-    def schedule_scenario(self, scenario_id: str, scenario_config: dict) -> None:
+    def schedule_scenario(self, scenario_id: str, spec: ScenarioSpec) -> None:
         """
         Schedule a scenario based on its configuration.
         """
-        schedule = scenario_config.get("schedule", {})
-        mode = schedule.get("mode", "once")
-        start_time = schedule.get("start_time", "immediate")
-        interval_minutes = schedule.get("interval_minutes", 10)
-        duration_hours = schedule.get("duration_hours", 1)
+        self.scenario_specs[scenario_id] = spec
+        self.per_iteration_expectations[scenario_id] = compile_expectations(spec.expectations, "per_iteration")
+        self.scenario_expectations[scenario_id] = compile_expectations(spec.expectations, "scenario")
+        self.completion_events[scenario_id] = threading.Event()
 
-        self.scenario_configs[scenario_id] = scenario_config
+        start_dt = spec.resolve_start()
 
         # Calculate end time for recurring jobs
-        if mode == "recurring":
-            if start_time == "immediate":
-                start_dt = datetime.now()
-            else:
-                start_dt = datetime.fromisoformat(start_time)
-            end_time = start_dt + timedelta(hours=duration_hours)
+        if spec.schedule_mode == "recurring":
+            end_time = start_dt + timedelta(hours=spec.duration_hours)
             self.scenario_end_times[scenario_id] = end_time
 
-        # Create the job function
-        job_func = self._create_job_function(scenario_id, scenario_config)
+        job_func = functools.partial(self._execute_test, scenario_id, spec)
 
-        if mode == "once":
-            if start_time == "immediate":
-                # Run immediately
-                trigger = DateTrigger(run_date=datetime.now())
-            else:
-                trigger = DateTrigger(run_date=datetime.fromisoformat(start_time))
-
-            job = self.scheduler.add_job(
-                job_func,
-                trigger=trigger,
-                id=f"scenario_{scenario_id}",
-                name=f"Scenario {scenario_config.get('id', scenario_id)}",
-            )
+        if spec.schedule_mode == "once":
+            trigger = DateTrigger(run_date=start_dt)
         else:  # recurring
-            if start_time == "immediate":
-                next_run = datetime.now()
-            else:
-                next_run = datetime.fromisoformat(start_time)
-
             trigger = IntervalTrigger(
-                minutes=interval_minutes,
-                start_date=next_run,
+                minutes=spec.interval_minutes,
+                start_date=start_dt,
                 end_date=self.scenario_end_times[scenario_id],
             )
 
-            job = self.scheduler.add_job(
-                job_func,
-                trigger=trigger,
-                id=f"scenario_{scenario_id}",
-                name=f"Scenario {scenario_config.get('id', scenario_id)}",
-            )
-
-        self.scenario_jobs[scenario_id] = job.id
+        self.scenario_triggers[scenario_id] = trigger
+        self.runs_in_flight[scenario_id] = 0
 
-    def _create_job_function(self, scenario_id: str, scenario_config: dict) -> Callable:
-        """Create a job function for the scenario."""
+        # A trigger that never fires (e.g. an interval longer than the duration)
+        # produces no job events, so the scenario is complete from the start
+        if trigger.get_next_fire_time(None, datetime.now().astimezone()) is None:
+            self.final_fire_reached.add(scenario_id)
+            self.completion_events[scenario_id].set()
 
-        def job_func():
-            self._execute_test(scenario_id, scenario_config)
+        job = self.scheduler.add_job(
+            job_func,
+            trigger=trigger,
+            id=f"scenario_{scenario_id}",
+            name=f"Scenario {spec.name or scenario_id}",
+        )
 
-        return job_func
+        self.scenario_jobs[scenario_id] = job.id
+        self.job_scenarios[job.id] = scenario_id
 
-    def _execute_test(self, scenario_id: str, scenario_config: dict) -> None:
+    def _execute_test(self, scenario_id: str, spec: ScenarioSpec) -> None:
         """Execute a single test run for a scenario."""
-        protocol = scenario_config.get("protocol")
-        parameters = scenario_config.get("parameters", {})
-        expectations = scenario_config.get("expectations", [])
+        protocol = spec.protocol
 
         if protocol not in PROTOCOL_HANDLERS:
             print(f"Unknown protocol: {protocol}")
             return
 
         # Generate run_id and get worker node
-        run_id = str(uuid.uuid4())
+        run_id = uuid.uuid4()
         worker_node = os.getenv("HOSTNAME", socket.gethostname())
         start_time = datetime.now()
 
@@ -121,89 +194,81 @@ class ScenarioScheduler:
 
         # Execute the test
         handler = PROTOCOL_HANDLERS[protocol]
-        results = handler(parameters)
+        results = handler(spec.parameters)
 
-        # Write metrics to database
-        for result in results:
-            metrics = self._extract_metrics(result)
+        # Write metrics from all results to database in one batch
+        metrics = [item for result in results for item in self._extract_metrics(result).items()]
+        if metrics:
             insert_raw_metrics_batch(run_id, metrics)
 
         # Evaluate expectations for per_iteration scope
-        self._evaluate_expectations(run_id, scenario_id, expectations, scope="per_iteration")
+        self._evaluate_expectations(
+            run_id, scenario_id, self.per_iteration_expectations[scenario_id], scope="per_iteration"
+        )
 
     def _extract_metrics(self, result) -> dict[str, float]:
         """Extract metrics from a test result object."""
         if hasattr(result, "__dataclass_fields__"):
-            return {field: getattr(result, field) for field in result.__dataclass_fields__
-                    if isinstance(getattr(result, field), (int, float))}
+            values = result.__dict__
+            return {field: values[field] for field in _numeric_fields(type(result))}
         elif isinstance(result, dict):
             return {k: v for k, v in result.items() if isinstance(v, (int, float))}
         return {}
 
     def _evaluate_expectations(self, run_id: str, scenario_id: str,
-                               expectations: list, scope: str) -> None:
+                               expectations: list[CompiledExpectation], scope: str) -> None:
         """Evaluate expectations and write to results_log."""
-        for expectation in expectations:
-            if expectation.get("evaluation_scope") != scope:
-                continue
+        if not expectations:
+            return
 
-            metric_name = expectation.get("metric")
-            operator = expectation.get("operator")
-            expected_value = expectation.get("value")
-            expected_unit = expectation.get("unit", "")
-            aggregation = expectation.get("aggregation", "avg")
+        # Aggregate once and reuse for every expectation in this scope
+        if scope == "per_iteration":
+            metrics = aggregate_metrics_for_run(run_id)
+        else:  # scenario
+            metrics = aggregate_metrics_for_scenario(scenario_id)
 
+        rows = []
+        for expectation in expectations:
             if scope == "per_iteration":
-                metrics = aggregate_metrics_for_run(run_id)
-                measured_value = metrics.get(metric_name, 0)
+                measured_value = metrics.get(expectation.metric_name, 0)
             else:  # scenario
-                measured_value = get_aggregated_value(scenario_id, metric_name, aggregation)
-
-            # Normalize units for comparison
-            measured_normalized, expected_normalized = normalize_for_comparison(
-                measured_value, expected_value, expected_unit, metric_name
-            )
+                measured_value = select_aggregated_value(
+                    metrics, expectation.metric_name, expectation.aggregation
+                )
 
-            status = self._compare_values(measured_normalized, operator, expected_normalized)
+            passed = expectation.compare(measured_value, expectation.expected_normalized)
 
-            insert_result_log(
-                run_id=run_id,
-                metric_name=metric_name,
-                expected_value=f"{expected_value} {expected_unit}",
-                measured_value=str(measured_value),
-                status=status,
-                scope=scope,
-            )
+            rows.append((
+                run_id,
+                expectation.metric_name,
+                expectation.expected_label,
+                str(measured_value),
+                "PASS" if passed else "FAIL",
+                scope,
+            ))
 
-    def _compare_values(self, measured: float, operator: str, expected: float) -> str:
-        """Compare measured value against expected using operator."""
-        comparisons = {
-            "lte": measured <= expected,
-            "lt": measured < expected,
-            "gte": measured >= expected,
-            "gt": measured > expected,
-            "eq": measured == expected,
-        }
-        return "PASS" if comparisons.get(operator, False) else "FAIL"
+        insert_result_logs_batch(rows)
 
     def finalize_scenario(self, scenario_id: str) -> None:
         """
         Finalize a scenario after all runs complete.
         Evaluates scenario-scope expectations and saves summary.
         """
-        scenario_config = self.scenario_configs.get(scenario_id, {})
-        expectations = scenario_config.get("expectations", [])
+        expectations = self.scenario_expectations.get(scenario_id, [])
+
+        # Make sure metrics queued by insert_raw_metric are visible to the aggregates
+        flush_metrics()
 
         # Get any run_id for this scenario to use for results_log
         from src.utils.db import get_connection
-        with get_connection() as conn:
+        with get_connection(readonly=True) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "SELECT run_id FROM load_test.test_runs WHERE scenario_id = %s LIMIT 1",
                     (scenario_id,)
                 )
                 row = cur.fetchone()
-                run_id = row[0] if row else str(uuid.uuid4())
+                run_id = row[0] if row else uuid.uuid4()
 
         # Evaluate scenario-scope expectations
         self._evaluate_expectations(run_id, scenario_id, expectations, scope="scenario")
@@ -211,17 +276,62 @@ class ScenarioScheduler:
         # Save aggregated summary
         save_scenario_summary(scenario_id)
 
+    def _on_job_event(self, event) -> None:
+        """
+        Mark a scenario complete once its trigger has no fire times left and
+        no submitted run is still executing.
+
+        Submitted and skipped fires (max_instances reached) are JobSubmissionEvents
+        covering one or more run times; every submitted run time later produces
+        exactly one executed, error or missed event.
+        """
+        scenario_id = self.job_scenarios.get(event.job_id)
+        if scenario_id is None:
+            return
+
+        with self._completion_lock:
+            if event.code in (EVENT_JOB_SUBMITTED, EVENT_JOB_MAX_INSTANCES):
+                if event.code == EVENT_JOB_SUBMITTED:
+                    self.runs_in_flight[scenario_id] += len(event.scheduled_run_times)
+
+                # Ask the trigger directly rather than the job store: get_job() takes
+                # the job store lock, which shutdown(wait=True) holds while joining
+                # the executor threads that dispatch run events.
+                last_run_time = max(event.scheduled_run_times)
+                now = datetime.now(last_run_time.tzinfo)
+                if self.scenario_triggers[scenario_id].get_next_fire_time(last_run_time, now) is None:
+                    self.final_fire_reached.add(scenario_id)
+            else:
+                # A run can finish before its submission event is dispatched, so
+                # the count may dip below zero briefly
+                self.runs_in_flight[scenario_id] -= 1
+
+            if scenario_id in self.final_fire_reached and self.runs_in_flight[scenario_id] == 0:
+                self.completion_events[scenario_id].set()
+
     def is_scenario_complete(self, scenario_id: str) -> bool:
         """Check if a scenario has completed all its scheduled runs."""
-        if scenario_id not in self.scenario_end_times:
-            # One-time job, check if it has run
-            job_id = self.scenario_jobs.get(scenario_id)
-            if job_id:
-                job = self.scheduler.get_job(job_id)
-                return job is None or job.next_run_time is None
-            return True
-
-        return datetime.now() >= self.scenario_end_times[scenario_id]
+        event = self.completion_events.get(scenario_id)
+        return event is None or event.is_set()
+
+    def wait_scenario_complete(self, scenario_id: str, timeout: float) -> bool:
+        """
+        Block until a scenario has completed all its scheduled runs.
+        Returns False if the timeout (in seconds) expires first.
+        """
+        event = self.completion_events.get(scenario_id)
+        return event is None or event.wait(max(0.0, timeout))
+
+    def wait_all_complete(self, timeout: float) -> bool:
+        """
+        Block until every scheduled scenario has completed its runs.
+        Returns False if the timeout (in seconds) expires first.
+        """
+        deadline = time.monotonic() + timeout
+        for event in self.completion_events.values():
+            if not event.wait(max(0.0, deadline - time.monotonic())):
+                return False
+        return True
 
     def get_pending_jobs(self) -> list:
         """Get list of pending jobs."""
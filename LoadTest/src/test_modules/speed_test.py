@@ -44,26 +44,27 @@ def _parse_url(url: str) -> tuple[str, int]:
 
 def _run_iperf3_test(host: str, port: int, duration: int) -> SpeedTestResult:
     """Run iperf3 test and collect metrics."""
-    # Download test (default mode - client receives from server)
-    download_result = _execute_iperf3(host, port, duration, reverse=True)
-    download_speed = _extract_speed(download_result)
-    download_jitter = _extract_jitter(download_result)
-    download_latency = _extract_latency(download_result)
+    # Measure both directions in one session (iperf3 >= 3.7)
+    data = _execute_iperf3(host, port, duration, bidir=True)
+    if "error" not in data:
+        end = data.get("end", {})
+        return _extract_all(end.get("sum_bidir_reverse", {}), end.get("sum", {}), end)
 
+    # Older servers reject --bidir; fall back to one run per direction.
+    # Download test (client receives from server)
+    download_end = _execute_iperf3(host, port, duration, reverse=True).get("end", {})
     # Upload test (client sends to server)
-    upload_result = _execute_iperf3(host, port, duration, reverse=False)
-    upload_speed = _extract_speed(upload_result)
-    upload_jitter = _extract_jitter(upload_result)
+    upload_end = _execute_iperf3(host, port, duration).get("end", {})
 
-    return SpeedTestResult(
-        download_speed=download_speed,
-        upload_speed=upload_speed,
-        jitter=max(download_jitter, upload_jitter),
-        latency=download_latency
+    return _extract_all(
+        download_end.get("sum", {}) or download_end.get("sum_received", {}),
+        upload_end.get("sum", {}) or upload_end.get("sum_received", {}),
+        download_end,
     )
 
 
-def _execute_iperf3(host: str, port: int, duration: int, reverse: bool) -> dict:
+def _execute_iperf3(host: str, port: int, duration: int,
+                    reverse: bool = False, bidir: bool = False) -> dict:
     """Execute iperf3 command and return JSON output."""
     cmd = [
         "iperf3",
@@ -75,6 +76,8 @@ def _execute_iperf3(host: str, port: int, duration: int, reverse: bool) -> dict:
     ]
     if reverse:
         cmd.append("-R")
+    if bidir:
+        cmd.append("--bidir")
 
     try:
         result = subprocess.run(cmd, capture_output=True, text=True, timeout=duration + 30)
@@ -83,34 +86,25 @@ def _execute_iperf3(host: str, port: int, duration: int, reverse: bool) -> dict:
         return {}
 
 
-def _extract_speed(data: dict) -> float:
-    """Extract speed in Mbps from iperf3 JSON output."""
-    try:
-        end = data.get("end", {})
-        sum_data = end.get("sum", {}) or end.get("sum_received", {})
-        bits_per_second = sum_data.get("bits_per_second", 0)
-        return bits_per_second / 1_000_000
-    except (KeyError, TypeError):
-        return 0.0
-
+def _extract_all(download_sum: dict, upload_sum: dict, latency_end: dict) -> SpeedTestResult:
+    """
+    Build a SpeedTestResult from iperf3 JSON sections.
 
-def _extract_jitter(data: dict) -> float:
-    """Extract jitter in ms from iperf3 JSON output."""
+    Args:
+        download_sum: 'end' summary for the server-to-client direction
+        upload_sum: 'end' summary for the client-to-server direction
+        latency_end: 'end' section whose first stream carries the RTT
+    """
     try:
-        end = data.get("end", {})
-        sum_data = end.get("sum", {})
-        return sum_data.get("jitter_ms", 0.0)
-    except (KeyError, TypeError):
-        return 0.0
-
+        streams = latency_end.get("streams", [])
+        sender = streams[0].get("sender", {}) if streams else {}
+        latency = sender.get("mean_rtt", 0) / 1000  # Convert from microseconds
+    except (AttributeError, TypeError):
+        latency = 0.0
 
-def _extract_latency(data: dict) -> float:
-    """Extract latency (RTT) in ms from iperf3 JSON output."""
-    try:
-        streams = data.get("end", {}).get("streams", [])
-        if streams:
-            sender = streams[0].get("sender", {})
-            return sender.get("mean_rtt", 0) / 1000  # Convert from microseconds
-        return 0.0
-    except (KeyError, TypeError, IndexError):
-        return 0.0
+    return SpeedTestResult(
+        download_speed=download_sum.get("bits_per_second", 0) / 1_000_000,
+        upload_speed=upload_sum.get("bits_per_second", 0) / 1_000_000,
+        jitter=max(download_sum.get("jitter_ms", 0.0), upload_sum.get("jitter_ms", 0.0)),
+        latency=latency,
+    )
@@ -1,5 +1,11 @@
+import asyncio
+import atexit
+import threading
 from dataclasses import dataclass
-from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright
+
+
+DEFAULT_MAX_CONCURRENT_PAGES = 4
 
 
 @dataclass
@@ -17,33 +23,95 @@ def run_web_browsing_test(parameters: dict) -> list[WebBrowsingResult]:
     """
     Run web browsing tests using Playwright.
 
+    Pages are loaded concurrently, each in its own browser context, on a
+    browser process shared across calls.
+
     Args:
-        parameters: dict with 'target_url' (list of URLs) and 'headless' (bool)
+        parameters: dict with 'target_url' (list of URLs), 'headless' (bool)
+                    and 'max_concurrent_pages' (int)
 
     Returns:
         List of WebBrowsingResult for each URL
     """
     target_urls = parameters.get("target_url", [])
     headless = parameters.get("headless", True)
+    max_concurrent_pages = parameters.get("max_concurrent_pages", DEFAULT_MAX_CONCURRENT_PAGES)
+
+    return _run_on_browser_loop(_run_async(target_urls, headless, max_concurrent_pages))
+
+
+# Playwright objects belong to the event loop that created them, but
+# APScheduler runs jobs on a thread pool. One long-lived loop in a
+# background thread owns the shared browser; callers submit coroutines to it.
+_loop = None
+_loop_lock = threading.Lock()
+
+_playwright = None
+_browsers = {}  # headless flag -> Browser
+_browser_lock = asyncio.Lock()
+
+
+def _run_on_browser_loop(coro):
+    """Run a coroutine on the browser loop and block until it finishes."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="playwright", daemon=True).start()
 
-    results = []
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=headless)
-        context = browser.new_context()
+    return asyncio.run_coroutine_threadsafe(coro, _loop).result()
 
-        for url in target_urls:
-            result = _load_page(context, url)
-            results.append(result)
 
-        browser.close()
+async def _get_browser(headless: bool):
+    """Return the shared browser, launching it on first use or after a crash."""
+    global _playwright
+    async with _browser_lock:
+        if _playwright is None:
+            _playwright = await async_playwright().start()
 
-    return results
+        browser = _browsers.get(headless)
+        if browser is None or not browser.is_connected():
+            browser = await _playwright.chromium.launch(headless=headless)
+            _browsers[headless] = browser
+        return browser
 
 
-def _load_page(context, url: str) -> WebBrowsingResult:
-    """Load a single page and collect metrics."""
-    page = context.new_page()
+async def _run_async(target_urls: list[str], headless: bool,
+                     max_concurrent_pages: int) -> list[WebBrowsingResult]:
+    browser = await _get_browser(headless)
+    semaphore = asyncio.Semaphore(max_concurrent_pages)
+    return list(await asyncio.gather(*(_load_page(browser, url, semaphore) for url in target_urls)))
 
+
+async def _close_browsers() -> None:
+    global _playwright
+    for browser in _browsers.values():
+        await browser.close()
+    _browsers.clear()
+    if _playwright is not None:
+        await _playwright.stop()
+        _playwright = None
+
+
+@atexit.register
+def _shutdown_browser_loop() -> None:
+    if _loop is not None:
+        _run_on_browser_loop(_close_browsers())
+        _loop.call_soon_threadsafe(_loop.stop)
+
+
+async def _load_page(browser, url: str, semaphore: asyncio.Semaphore) -> WebBrowsingResult:
+    """Load a single page in a fresh browser context and collect metrics."""
+    async with semaphore:
+        context = await browser.new_context()
+        try:
+            page = await context.new_page()
+            return await _measure_page(page, url)
+        finally:
+            await context.close()
+
+
+async def _measure_page(page, url: str) -> WebBrowsingResult:
     resource_count = 0
     redirect_count = 0
     http_response_code = 0
@@ -59,11 +127,11 @@ def _load_page(context, url: str) -> WebBrowsingResult:
     page.on("response", on_response)
 
     try:
-        response = page.goto(url, wait_until="load")
+        response = await page.goto(url, wait_until="load")
         if response:
             http_response_code = response.status
 
-        timing = page.evaluate("""() => {
+        timing = await page.evaluate("""() => {
             const perf = performance.getEntriesByType('navigation')[0];
             return {
                 page_load_time: perf.loadEventEnd - perf.startTime,
@@ -72,7 +140,7 @@ def _load_page(context, url: str) -> WebBrowsingResult:
             };
         }""")
 
-        result = WebBrowsingResult(
+        return WebBrowsingResult(
             url=url,
             page_load_time=timing.get("page_load_time", 0),
             ttfb=timing.get("ttfb", 0),
@@ -82,7 +150,7 @@ def _load_page(context, url: str) -> WebBrowsingResult:
             redirect_count=redirect_count
         )
     except Exception:
-        result = WebBrowsingResult(
+        return WebBrowsingResult(
             url=url,
             page_load_time=0,
             ttfb=0,
@@ -91,13 +159,8 @@ def _load_page(context, url: str) -> WebBrowsingResult:
             resource_count=resource_count,
             redirect_count=redirect_count
         )
-    finally:
-        page.close()
-
-    return result
 
 if __name__ == "__main__":
     params = {"target_url" : ["https://www.google.com","https://www.youtube.com"], "headless": True}
     results = run_web_browsing_test(parameters=params)
     print(results)
-    
\ No newline at end of file
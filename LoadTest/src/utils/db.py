@@ -1,9 +1,43 @@
+import atexit
+import csv
+import io
 import os
-import uuid
+import queue
+import select
+import threading
+import time
 from datetime import datetime
 from contextlib import contextmanager
+from typing import Iterator
+import orjson
 import psycopg2
-from psycopg2.extras import RealDictCursor
+import psycopg2.extensions
+from psycopg2.extras import Json, NamedTupleCursor, execute_values, register_default_jsonb, register_uuid
+from psycopg2.pool import ThreadedConnectionPool
+
+
+JOBS_CHANNEL = "loadtest_jobs"
+RAW_METRICS_FETCH_SIZE = 10_000
+INSERT_PAGE_SIZE = 1000
+COPY_MIN_ROWS = 100
+POOL_MIN_CONNECTIONS = 2
+POOL_MAX_CONNECTIONS = 16
+METRIC_FLUSH_INTERVAL = 0.05  # seconds to wait for more queued metrics
+METRIC_FLUSH_MAX_ROWS = 1000
+EXPORT_BUFFER_SIZE = 1024 * 1024
+
+# Pass uuid.UUID values as native uuid parameters instead of formatting them as text
+register_uuid()
+
+# Decode jsonb columns (e.g. scenario configs claimed by workers) with orjson
+register_default_jsonb(globally=True, loads=orjson.loads)
+
+
+class OJson(Json):
+    """Json adapter that serializes with orjson instead of the stdlib encoder."""
+
+    def dumps(self, obj):
+        return orjson.dumps(obj).decode()
 
 
 def get_connection_params() -> dict:
@@ -17,32 +51,107 @@ def get_connection_params() -> dict:
     }
 
 
+# Single-row statements run through execute_prepared(). Each is parsed and
+# planned once per connection with PREPARE, then reused with EXECUTE.
+PREPARED_STATEMENTS = {
+    "insert_scenario": """
+        INSERT INTO load_test.scenarios (scenario_id, protocol, config_snapshot)
+        VALUES ($1, $2, $3)
+        ON CONFLICT (scenario_id) DO UPDATE SET config_snapshot = EXCLUDED.config_snapshot
+    """,
+    "insert_test_run": """
+        INSERT INTO load_test.test_runs (run_id, scenario_id, start_time, worker_node)
+        VALUES ($1, $2, $3, $4)
+    """,
+    "insert_pending_job": """
+        INSERT INTO load_test.pending_jobs (scenario_id, created_at)
+        VALUES ($1, NOW())
+    """,
+}
+
+
+class _PooledConnection(psycopg2.extensions.connection):
+    """Connection that remembers which PREPARED_STATEMENTS exist on its session."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared_statements = set()
+
+
+def execute_prepared(cur, name: str, args: tuple) -> None:
+    """
+    Execute one of PREPARED_STATEMENTS with the given arguments.
+    The statement is prepared on the cursor's connection the first time it is used there.
+    """
+    conn = cur.connection
+    if name not in conn.prepared_statements:
+        # Prepared statements live for the session and survive a rollback
+        cur.execute(f"PREPARE {name} AS {PREPARED_STATEMENTS[name]}")
+        conn.prepared_statements.add(name)
+    placeholders = ", ".join(["%s"] * len(args))
+    cur.execute(f"EXECUTE {name} ({placeholders})", args)
+
+
+# Created on first use: the orchestrator imports this module before the
+# database container is running.
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ThreadedConnectionPool:
+    """Return the process-wide connection pool, creating it if needed."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadedConnectionPool(
+                POOL_MIN_CONNECTIONS, POOL_MAX_CONNECTIONS,
+                connection_factory=_PooledConnection, **get_connection_params()
+            )
+        return _pool
+
+
 @contextmanager
-def get_connection():
-    """Context manager for database connections."""
-    conn = psycopg2.connect(**get_connection_params())
-    conn.autocommit = False
+def get_connection(readonly: bool = False):
+    """
+    Context manager for pooled database connections.
+    With readonly=True the connection is in autocommit mode, so single read
+    statements run without an explicit BEGIN/COMMIT around them.
+    """
+    pool = _get_pool()
+    conn = pool.getconn()
+    conn.autocommit = readonly
     try:
         yield conn
-        conn.commit()
+        if not readonly:
+            conn.commit()
     except Exception:
-        conn.rollback()
+        if not readonly:
+            conn.rollback()
         raise
     finally:
-        conn.close()
+        # Discard connections that were closed by a server or network failure
+        pool.putconn(conn, close=bool(conn.closed))
+
+
+@contextmanager
+def bulk_insert_session():
+    """
+    Cursor for writing many rows in a single transaction.
+    The commit does not wait for its WAL flush (synchronous_commit is off for
+    this transaction only), so a database crash may drop the last few batches.
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL synchronous_commit TO OFF")
+            yield cur
 
 
 def insert_scenario(scenario_id: str, protocol: str, config_snapshot: dict) -> None:
     """Insert a new scenario into the scenarios table."""
     with get_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO load_test.scenarios (scenario_id, protocol, config_snapshot)
-                VALUES (%s, %s, %s)
-                ON CONFLICT (scenario_id) DO UPDATE SET config_snapshot = EXCLUDED.config_snapshot
-                """,
-                (scenario_id, protocol, psycopg2.extras.Json(config_snapshot))
+            execute_prepared(
+                cur, "insert_scenario", (scenario_id, protocol, OJson(config_snapshot))
             )
 
 
@@ -50,65 +159,136 @@ def insert_test_run(run_id: str, scenario_id: str, start_time: datetime, worker_
     """Insert a new test run into the test_runs table."""
     with get_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO load_test.test_runs (run_id, scenario_id, start_time, worker_node)
-                VALUES (%s, %s, %s, %s)
-                """,
-                (run_id, scenario_id, start_time, worker_node)
-            )
+            execute_prepared(cur, "insert_test_run", (run_id, scenario_id, start_time, worker_node))
 
 
-def insert_raw_metric(run_id: str, metric_name: str, metric_value: str) -> None:
-    """Insert a raw metric into the raw_metrics table."""
-    metric_id = str(uuid.uuid4())
-    timestamp = datetime.now()
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO load_test.raw_metrics (id, run_id, metric_name, metric_value, timestamp)
-                VALUES (%s, %s, %s, %s, %s)
-                """,
-                (metric_id, run_id, metric_name, metric_value, timestamp)
-            )
+def insert_raw_metric(run_id: str, metric_name: str, metric_value: float) -> None:
+    """
+    Queue a raw metric for insertion.
+    A background thread writes queued metrics in batches; call
+    flush_metrics() to wait until everything queued has been written.
+    """
+    _ensure_metric_flusher()
+    _metric_queue.put((run_id, metric_name, metric_value))
 
 
-def insert_raw_metrics_batch(run_id: str, metrics: dict[str, float]) -> None:
-    """Insert multiple raw metrics in a single transaction."""
-    timestamp = datetime.now()
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            for metric_name, metric_value in metrics.items():
-                metric_id = str(uuid.uuid4())
-                cur.execute(
-                    """
-                    INSERT INTO load_test.raw_metrics (id, run_id, metric_name, metric_value, timestamp)
-                    VALUES (%s, %s, %s, %s, %s)
-                    """,
-                    (metric_id, run_id, metric_name, str(metric_value), timestamp)
-                )
+@atexit.register
+def flush_metrics() -> None:
+    """Block until every metric queued by insert_raw_metric has been written."""
+    _metric_queue.join()
+
+
+_metric_queue = queue.Queue()
+_metric_flusher = None
+_metric_flusher_lock = threading.Lock()
+
+
+def _ensure_metric_flusher() -> None:
+    global _metric_flusher
+    if _metric_flusher is not None:
+        return
+    with _metric_flusher_lock:
+        if _metric_flusher is None:
+            _metric_flusher = threading.Thread(target=_flush_metrics_loop, name="metric-flusher", daemon=True)
+            _metric_flusher.start()
+
+
+def _flush_metrics_loop() -> None:
+    """
+    Drain the metric queue in batches of up to METRIC_FLUSH_MAX_ROWS.
+    Every row in a batch is stamped with the time the batch was drained
+    rather than the time each row was queued.
+    """
+    while True:
+        items = [_metric_queue.get()]
+        deadline = time.monotonic() + METRIC_FLUSH_INTERVAL
+        while len(items) < METRIC_FLUSH_MAX_ROWS:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(_metric_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        timestamp = datetime.now().isoformat(sep=" ")
+        rows = [(*item, timestamp) for item in items]
+        try:
+            with bulk_insert_session() as cur:
+                _write_raw_metric_rows(cur, rows)
+        except Exception as exc:
+            print(f"Failed to write {len(rows)} queued metrics: {exc}")
+        finally:
+            for _ in rows:
+                _metric_queue.task_done()
+
+
+def insert_raw_metrics_batch(run_id: str, metrics: list[tuple[str, float]]) -> None:
+    """
+    Insert multiple raw metrics in a single transaction.
+    metrics is a list of (metric_name, metric_value) pairs; names may repeat.
+    """
+    timestamp = datetime.now().isoformat(sep=" ")
+    rows = [
+        (run_id, metric_name, metric_value, timestamp)
+        for metric_name, metric_value in metrics
+    ]
+    with bulk_insert_session() as cur:
+        _write_raw_metric_rows(cur, rows)
+
+
+def _write_raw_metric_rows(cur, rows: list[tuple]) -> None:
+    """
+    Write (run_id, metric_name, metric_value, timestamp) rows to raw_metrics.
+    Large batches are streamed with COPY; small ones use a multi-row INSERT,
+    which has less setup overhead.
+    """
+    if len(rows) < COPY_MIN_ROWS:
+        execute_values(
+            cur,
+            "INSERT INTO load_test.raw_metrics (run_id, metric_name, metric_value, timestamp) VALUES %s",
+            rows,
+            page_size=INSERT_PAGE_SIZE
+        )
+        return
+
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cur.copy_expert(
+        "COPY load_test.raw_metrics (run_id, metric_name, metric_value, timestamp) FROM STDIN WITH (FORMAT CSV)",
+        buffer
+    )
 
 
 def insert_result_log(run_id: str, metric_name: str, expected_value: str,
                       measured_value: str, status: str, scope: str) -> None:
     """Insert a result log entry."""
-    result_id = str(uuid.uuid4())
+    insert_result_logs_batch([(run_id, metric_name, expected_value, measured_value, status, scope)])
+
+
+def insert_result_logs_batch(rows: list[tuple]) -> None:
+    """
+    Insert result log entries with a single multi-row INSERT.
+    rows are (run_id, metric_name, expected_value, measured_value, status, scope) tuples.
+    """
+    if not rows:
+        return
     with get_connection() as conn:
         with conn.cursor() as cur:
+            values = b",".join(
+                cur.mogrify("(%s, %s, %s, %s, %s, %s)", row) for row in rows
+            )
             cur.execute(
-                """
-                INSERT INTO load_test.results_log (id, run_id, metric_name, expected_value, measured_value, status, scope)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """,
-                (result_id, run_id, metric_name, expected_value, measured_value, status, scope)
+                b"INSERT INTO load_test.results_log "
+                b"(run_id, metric_name, expected_value, measured_value, status, scope) VALUES " + values
             )
 
 
-def get_raw_metrics_for_run(run_id: str) -> list[dict]:
-    """Get all raw metrics for a specific run."""
-    with get_connection() as conn:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+def get_raw_metrics_for_run(run_id: str) -> list[tuple]:
+    """Get all raw metrics for a specific run as (metric_name, metric_value, timestamp) named tuples."""
+    with get_connection(readonly=True) as conn:
+        with conn.cursor(cursor_factory=NamedTupleCursor) as cur:
             cur.execute(
                 """
                 SELECT metric_name, metric_value, timestamp
@@ -120,34 +300,77 @@ def get_raw_metrics_for_run(run_id: str) -> list[dict]:
             return cur.fetchall()
 
 
-def get_raw_metrics_for_scenario(scenario_id: str) -> list[dict]:
-    """Get all raw metrics for a scenario (across all runs)."""
+def get_raw_metrics_for_scenario(scenario_id: str) -> Iterator[tuple]:
+    """
+    Stream all raw metrics for a scenario (across all runs) as
+    (metric_name, metric_value, timestamp) named tuples.
+    Rows are fetched through a server-side cursor in chunks of
+    RAW_METRICS_FETCH_SIZE, so memory stays bounded for large scenarios.
+    """
+    # Named (server-side) cursors only exist inside a transaction
     with get_connection() as conn:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        with conn.cursor(name="raw_metrics_stream", cursor_factory=NamedTupleCursor) as cur:
+            cur.itersize = RAW_METRICS_FETCH_SIZE
             cur.execute(
                 """
-                SELECT rm.metric_name, rm.metric_value::NUMERIC as metric_value, rm.timestamp
+                SELECT rm.metric_name, rm.metric_value, rm.timestamp
                 FROM load_test.raw_metrics rm
                 JOIN load_test.test_runs tr ON rm.run_id = tr.run_id
                 WHERE tr.scenario_id = %s
                 """,
                 (scenario_id,)
             )
+            yield from cur
+
+
+# Per-metric statistics for one scenario, computed server-side.
+# percentile_cont interpolates linearly between the two closest ranks and
+# evaluates both percentiles over a single sort.
+_SCENARIO_AGGREGATES_SQL = """
+    WITH samples AS (
+        SELECT rm.metric_name, rm.metric_value AS v
+        FROM load_test.raw_metrics rm
+        JOIN load_test.test_runs tr ON rm.run_id = tr.run_id
+        WHERE tr.scenario_id = %(scenario_id)s
+    ), stats AS (
+        SELECT metric_name,
+               count(*) AS sample_count,
+               avg(v) AS avg_value,
+               min(v) AS min_value,
+               max(v) AS max_value,
+               percentile_cont(ARRAY[0.5, 0.99]) WITHIN GROUP (ORDER BY v) AS percentiles,
+               coalesce(stddev_samp(v), 0) AS stddev_value
+        FROM samples
+        GROUP BY metric_name
+    )
+    SELECT metric_name, sample_count, avg_value, min_value, max_value,
+           percentiles[1] AS p50_value, percentiles[2] AS p99_value, stddev_value
+    FROM stats
+"""
+
+
+def get_scenario_aggregates_sql(scenario_id: str) -> list[tuple]:
+    """Get aggregated statistics per metric for a scenario, computed in the database."""
+    with get_connection(readonly=True) as conn:
+        with conn.cursor(cursor_factory=NamedTupleCursor) as cur:
+            cur.execute(
+                _SCENARIO_AGGREGATES_SQL,
+                {"scenario_id": scenario_id}
+            )
             return cur.fetchall()
 
 
-def insert_scenario_summary(scenario_id: str, metric_name: str, sample_count: int,
-                            avg_value: float, min_value: float, max_value: float,
-                            p50_value: float, p99_value: float, stddev_value: float) -> None:
-    """Insert or update scenario summary."""
-    summary_id = str(uuid.uuid4())
+def upsert_scenario_summary(scenario_id: str) -> None:
+    """Aggregate a scenario's raw metrics and upsert them into scenario_summary in one statement."""
     with get_connection() as conn:
         with conn.cursor() as cur:
             cur.execute(
-                """
+                f"""
                 INSERT INTO load_test.scenario_summary
-                (id, scenario_id, metric_name, sample_count, avg_value, min_value, max_value, p50_value, p99_value, stddev_value, aggregated_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
+                (scenario_id, metric_name, sample_count, avg_value, min_value, max_value, p50_value, p99_value, stddev_value, aggregated_at)
+                SELECT %(scenario_id)s::uuid, metric_name, sample_count, avg_value,
+                       min_value, max_value, p50_value, p99_value, stddev_value, NOW()
+                FROM ({_SCENARIO_AGGREGATES_SQL}) agg
                 ON CONFLICT (scenario_id, metric_name) DO UPDATE SET
                     sample_count = EXCLUDED.sample_count,
                     avg_value = EXCLUDED.avg_value,
@@ -158,8 +381,7 @@ def insert_scenario_summary(scenario_id: str, metric_name: str, sample_count: in
                     stddev_value = EXCLUDED.stddev_value,
                     aggregated_at = NOW()
                 """,
-                (summary_id, scenario_id, metric_name, sample_count, avg_value,
-                 min_value, max_value, p50_value, p99_value, stddev_value)
+                {"scenario_id": scenario_id}
             )
 
 
@@ -168,12 +390,76 @@ def export_tables_to_csv(output_dir: str) -> None:
     os.makedirs(output_dir, exist_ok=True)
     tables = ["scenarios", "test_runs", "raw_metrics", "results_log", "scenario_summary"]
 
-    with get_connection() as conn:
+    with get_connection(readonly=True) as conn:
         with conn.cursor() as cur:
             for table in tables:
                 output_path = os.path.join(output_dir, f"{table}.csv")
-                with open(output_path, "w") as f:
+                # Binary sink: COPY output is written as-is, without a text-decoding layer
+                with open(output_path, "wb", buffering=EXPORT_BUFFER_SIZE) as f:
                     cur.copy_expert(
-                        f"COPY load_test.{table} TO STDOUT WITH CSV HEADER",
+                        f"COPY load_test.{table} TO STDOUT WITH (FORMAT CSV, HEADER)",
                         f
                     )
+
+
+def clear_pending_jobs() -> None:
+    """Drop unclaimed jobs left behind by an earlier orchestration."""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM load_test.pending_jobs WHERE claimed_by IS NULL")
+
+
+def insert_pending_job(scenario_id: str) -> None:
+    """Queue a scenario for the worker pool and wake idle workers."""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            execute_prepared(cur, "insert_pending_job", (scenario_id,))
+            # Delivered to listeners when the transaction commits
+            cur.execute(f"NOTIFY {JOBS_CHANNEL}")
+
+
+def claim_pending_job(worker_node: str, timeout: float) -> tuple[str, dict] | None:
+    """
+    Claim the oldest unclaimed job, waiting up to timeout seconds for one.
+    Returns (scenario_id, config_snapshot), or None if no job arrived in time.
+    """
+    deadline = time.monotonic() + timeout
+    conn = psycopg2.connect(**get_connection_params())
+    # LISTEN only delivers notifications outside of a transaction
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            # Listen before the first claim attempt so no NOTIFY is missed
+            cur.execute(f"LISTEN {JOBS_CHANNEL}")
+            while True:
+                cur.execute(
+                    """
+                    UPDATE load_test.pending_jobs pj
+                    SET claimed_by = %s, claimed_at = NOW()
+                    FROM load_test.scenarios s
+                    WHERE pj.job_id = (
+                        SELECT job_id FROM load_test.pending_jobs
+                        WHERE claimed_by IS NULL
+                        ORDER BY created_at
+                        LIMIT 1
+                        FOR UPDATE SKIP LOCKED
+                    ) AND s.scenario_id = pj.scenario_id
+                    RETURNING pj.scenario_id, s.config_snapshot
+                    """,
+                    (worker_node,)
+                )
+                row = cur.fetchone()
+                if row:
+                    return row[0], row[1]
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+
+                # Block until a job is posted rather than polling the table
+                readable, _, _ = select.select([conn], [], [], remaining)
+                if readable:
+                    conn.poll()
+                    conn.notifies.clear()
+    finally:
+        conn.close()
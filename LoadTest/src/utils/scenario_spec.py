@@ -0,0 +1,52 @@
+"""
+Resolved scenario configuration.
+
+Scenario entries from main.json are parsed once into a ScenarioSpec so the
+orchestrator, scheduler and workers don't re-walk the nested config dicts
+on every run.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+
+
+@dataclass(frozen=True)
+class ScenarioSpec:
+    name: str | None
+    enabled: bool
+    protocol: str
+    schedule_mode: str             # "once" or "recurring"
+    start_time: str                # "immediate" or an ISO timestamp
+    interval_minutes: float
+    duration_hours: float
+    parameters: dict
+    expectations: list
+    config: dict                   # Original scenario entry
+
+    @classmethod
+    def from_config(cls, config: dict) -> "ScenarioSpec":
+        """Build a spec from a scenario entry of main.json."""
+        schedule = config.get("schedule", {})
+
+        return cls(
+            name=config.get("id"),
+            enabled=config.get("enabled", False),
+            protocol=config.get("protocol", "unknown"),
+            schedule_mode=schedule.get("mode", "once"),
+            start_time=schedule.get("start_time", "immediate"),
+            interval_minutes=schedule.get("interval_minutes", 10),
+            duration_hours=schedule.get("duration_hours", 1),
+            parameters=config.get("parameters", {}),
+            expectations=config.get("expectations", []),
+            config=config,
+        )
+
+    def resolve_start(self) -> datetime:
+        """
+        Return the first run time, resolving "immediate" to now.
+        Parsed here rather than in from_config so a disabled scenario with an
+        unparsable start_time doesn't fail the whole configuration.
+        """
+        if self.start_time == "immediate":
+            return datetime.now()
+        return datetime.fromisoformat(self.start_time)
@@ -54,14 +54,55 @@ METRIC_CATEGORIES = {
 }
 
 
+CONVERSION_TABLES = {
+    "speed": SPEED_CONVERSIONS,
+    "time": TIME_CONVERSIONS,
+    "count": COUNT_CONVERSIONS,
+}
+
+STANDARD_UNITS = {
+    "speed": "mbps",
+    "time": "ms",
+    "count": "count",
+}
+
+# metric_name -> (category, standard_unit, conversion_table); metrics not
+# listed here are treated as counts.
+_METRIC_META = {
+    metric_name: (category, STANDARD_UNITS[category], CONVERSION_TABLES[category])
+    for metric_name, category in METRIC_CATEGORIES.items()
+}
+_DEFAULT_META = ("count", STANDARD_UNITS["count"], COUNT_CONVERSIONS)
+
+
 def get_conversion_table(category: str) -> dict:
     """Get the conversion table for a category."""
-    tables = {
-        "speed": SPEED_CONVERSIONS,
-        "time": TIME_CONVERSIONS,
-        "count": COUNT_CONVERSIONS,
-    }
-    return tables.get(category, COUNT_CONVERSIONS)
+    return CONVERSION_TABLES.get(category, COUNT_CONVERSIONS)
+
+
+# Flattened lookups built once at import: (metric_name, unit) -> multiplier.
+# Units are matched case-insensitively, so only lowercase table keys are
+# reachable. Their common spellings ("mbps", "MBPS", "Mbps") are stored
+# directly; other spellings fall back to a lowercased lookup.
+# Unknown metrics and units convert with 1.0.
+_TO_STD = {}
+_FROM_STD = {}
+for _metric_name, (_, _, _table) in _METRIC_META.items():
+    for _unit, (_multiplier, _) in _table.items():
+        if _unit != _unit.lower():
+            continue
+        for _variant in (_unit, _unit.upper(), _unit.capitalize()):
+            _TO_STD[(_metric_name, _variant)] = float(_multiplier)
+            _FROM_STD[(_metric_name, _variant)] = 1.0 / _multiplier
+
+
+def _multiplier(table: dict, metric_name: str, unit: str) -> float:
+    """Look up a multiplier, lowercasing the unit only if its spelling isn't stored."""
+    unit = unit or ""
+    multiplier = table.get((metric_name, unit))
+    if multiplier is None:
+        multiplier = table.get((metric_name, unit.lower()), 1.0)
+    return multiplier
 
 
 def convert_to_standard(value: float, unit: str, metric_name: str) -> float:
@@ -74,19 +115,9 @@ def convert_to_standard(value: float, unit: str, metric_name: str) -> float:
         metric_name: The metric name to determine the category
 
     Returns:
-        Value in standard units
+        Value in standard units (unchanged if the unit is not recognized)
     """
-    category = METRIC_CATEGORIES.get(metric_name, "count")
-    conversion_table = get_conversion_table(category)
-
-    unit_lower = unit.lower() if unit else ""
-
-    if unit_lower in conversion_table:
-        multiplier, _ = conversion_table[unit_lower]
-        return value * multiplier
-
-    # If unit not recognized, return as-is
-    return value
+    return value * _multiplier(_TO_STD, metric_name, unit)
 
 
 def convert_from_standard(value: float, target_unit: str, metric_name: str) -> float:
@@ -101,28 +132,12 @@ def convert_from_standard(value: float, target_unit: str, metric_name: str) -> f
     Returns:
         Value in target units
     """
-    category = METRIC_CATEGORIES.get(metric_name, "count")
-    conversion_table = get_conversion_table(category)
-
-    unit_lower = target_unit.lower() if target_unit else ""
-
-    if unit_lower in conversion_table:
-        multiplier, _ = conversion_table[unit_lower]
-        if multiplier != 0:
-            return value / multiplier
-
-    return value
+    return value * _multiplier(_FROM_STD, metric_name, target_unit)
 
 
 def get_standard_unit(metric_name: str) -> str:
     """Get the standard unit for a metric."""
-    category = METRIC_CATEGORIES.get(metric_name, "count")
-    standard_units = {
-        "speed": "mbps",
-        "time": "ms",
-        "count": "count",
-    }
-    return standard_units.get(category, "count")
+    return _METRIC_META.get(metric_name, _DEFAULT_META)[1]
 
 
 def normalize_for_comparison(measured_value: float, expected_value: float,
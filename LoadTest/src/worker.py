@@ -1,52 +1,57 @@
 #!/usr/bin/env python3
 """
 Worker module that runs inside Docker containers.
-Executes scheduled tests for a specific scenario.
+Claims a scenario from the pending_jobs queue and executes its scheduled tests.
 """
 
-import json
 import os
-import sys
-import time
+import socket
 from datetime import datetime, timedelta
 
 from src.scheduler import ScenarioScheduler
+from src.utils.db import claim_pending_job
+from src.utils.scenario_spec import ScenarioSpec
 
 
-def run_worker(scenario_id: str):
-    """Run worker for a specific scenario."""
-    # Get scenario config from environment
-    scenario_config_str = os.getenv("SCENARIO_CONFIG")
-    if not scenario_config_str:
-        print(f"Error: SCENARIO_CONFIG not set for scenario {scenario_id}")
-        sys.exit(1)
+# How long an idle worker waits for a job before exiting
+JOB_WAIT_SECONDS = float(os.getenv("JOB_WAIT_SECONDS", 300))
+
+# Upper bound on how long a run may still be executing after the scenario's
+# end before the worker gives up on it. Normally the scheduler's completion
+# event wakes the worker as soon as the last run finishes.
+RUN_GRACE_PERIOD = timedelta(minutes=5)
+
+
+def run_pool_worker() -> None:
+    """Wait for a job from the orchestrator, then run it."""
+    worker_node = os.getenv("HOSTNAME", socket.gethostname())
+    print(f"Worker {worker_node} waiting for a job...")
 
-    scenario_config = json.loads(scenario_config_str)
+    job = claim_pending_job(worker_node, timeout=JOB_WAIT_SECONDS)
+    if job is None:
+        print(f"No job received within {JOB_WAIT_SECONDS:g}s, exiting")
+        return
 
-    print(f"Worker starting for scenario: {scenario_config.get('id', scenario_id)}")
-    print(f"  Protocol: {scenario_config.get('protocol')}")
+    scenario_id, scenario_config = job
+    run_worker(scenario_id, ScenarioSpec.from_config(scenario_config))
+
+
+def run_worker(scenario_id: str, spec: ScenarioSpec):
+    """Run worker for a specific scenario."""
+    print(f"Worker starting for scenario: {spec.name or scenario_id}")
+    print(f"  Protocol: {spec.protocol}")
     print(f"  Hostname: {os.getenv('HOSTNAME', 'unknown')}")
 
     # Create scheduler and schedule the scenario
     scheduler = ScenarioScheduler()
-    scheduler.schedule_scenario(scenario_id, scenario_config)
+    scheduler.schedule_scenario(scenario_id, spec)
     scheduler.start()
 
-    # Calculate end time
-    schedule = scenario_config.get("schedule", {})
-    mode = schedule.get("mode", "once")
-    duration_hours = schedule.get("duration_hours", 1)
-
-    if mode == "once":
-        # Wait for single execution to complete
-        time.sleep(60)
-    else:
-        # Wait for full duration
-        end_time = datetime.now() + timedelta(hours=duration_hours)
-        while datetime.now() < end_time:
-            if scheduler.is_scenario_complete(scenario_id):
-                break
-            time.sleep(30)
+    # Woken by the completion event; the timeout only covers a run that hangs
+    end_time = spec.resolve_start() + timedelta(hours=spec.duration_hours) + RUN_GRACE_PERIOD
+    remaining = (end_time - datetime.now()).total_seconds()
+    if not scheduler.wait_scenario_complete(scenario_id, timeout=remaining):
+        print(f"  A run was still executing {RUN_GRACE_PERIOD} after the scenario ended; finalizing anyway")
 
     # Finalize
     scheduler.finalize_scenario(scenario_id)
@@ -56,9 +61,4 @@ def run_worker(scenario_id: str):
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python -m src.worker <scenario_id>")
-        sys.exit(1)
-
-    scenario_id = sys.argv[1]
-    run_worker(scenario_id)
+    run_pool_worker()